@@ -3,39 +3,201 @@ Behavioral Analysis Module
 Implements Self-Determination Theory (SDT) metrics for delegate fatigue
 """
 
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
 from collections import defaultdict
 
+try:
+    import numba
+except ImportError:  # compiled fatigue kernel is optional
+    numba = None
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def _fatigue_kernel(voter_codes, vote_time_ns, midpoint_ns):
+    """
+    Single pass over votes sorted by (voter, vote_time)
+
+    Returns per-voter arrays: voter code, average gap, longest gap, vote
+    count, votes at/after midpoint_ns and most recent gap. Gaps are whole
+    days (floored), NaN for voters with a single vote.
+    """
+    n_rows = len(voter_codes)
+    n_groups = 0
+    for i in range(n_rows):
+        if i == 0 or voter_codes[i] != voter_codes[i - 1]:
+            n_groups += 1
+
+    group_codes = np.empty(n_groups, dtype=np.int32)
+    avg_gap = np.full(n_groups, np.nan)
+    longest = np.full(n_groups, np.nan)
+    recent_gap = np.full(n_groups, np.nan)
+    total = np.zeros(n_groups, dtype=np.int64)
+    recent = np.zeros(n_groups, dtype=np.int64)
+
+    g = -1
+    gap_sum = 0.0
+    for i in range(n_rows):
+        if i == 0 or voter_codes[i] != voter_codes[i - 1]:
+            if g >= 0 and total[g] > 1:
+                avg_gap[g] = gap_sum / (total[g] - 1)
+            g += 1
+            group_codes[g] = voter_codes[i]
+            gap_sum = 0.0
+        else:
+            gap = float((vote_time_ns[i] - vote_time_ns[i - 1]) // NS_PER_DAY)
+            gap_sum += gap
+            if np.isnan(longest[g]) or gap > longest[g]:
+                longest[g] = gap
+            recent_gap[g] = gap
+        total[g] += 1
+        if vote_time_ns[i] >= midpoint_ns:
+            recent[g] += 1
+    if g >= 0 and total[g] > 1:
+        avg_gap[g] = gap_sum / (total[g] - 1)
+
+    return group_codes, avg_gap, longest, total, recent, recent_gap
+
+
+if numba is not None:
+    _fatigue_kernel = numba.njit(cache=True)(_fatigue_kernel)
+else:
+    _fatigue_kernel = None
+
 
 class BehavioralAnalyzer:
     """Analyzes voting patterns to detect delegate fatigue"""
+
+    VOTES_CACHE = "data/cache/votes.feather"
     
-    def __init__(self, data: Dict):
+    def __init__(self, data: Optional[Union[Dict, str]] = None, votes_cache: str = VOTES_CACHE):
+        """
+        Args:
+            data: Raw Snapshot dataset (as produced by SnapshotCollector), or
+                a path to either its JSON cache file (streamed from disk) or
+                the Arrow vote table written by SnapshotCollector.save_to_cache.
+                If omitted, the vote table at `votes_cache` is loaded.
+            votes_cache: Default Arrow (feather) vote table location
+        """
         self.data = data
-        self.df_votes = self._prepare_dataframe()
+        # Display-only lookup; kept out of df_votes (empty for the Arrow path)
+        self.proposal_titles = {}
+        if data is None:
+            if not os.path.exists(votes_cache):
+                raise FileNotFoundError(f"No vote cache at {votes_cache}")
+            data = votes_cache
+        if isinstance(data, (str, os.PathLike)):
+            self.data = None
+            if os.fspath(data).endswith(".json"):
+                self.df_votes, self.proposal_titles = self._load_streaming(data)
+            else:
+                self.df_votes = self._finalize_votes(pd.read_feather(data))
+        else:
+            self.df_votes = self._prepare_dataframe()
+            self.proposal_titles = {p["id"]: p["title"] for p in data["proposals"]}
+        self._results_cache = None
+        self._metrics_cache = None
+        # Lookup tables for calculate_participation_rate, built on first use
+        self._voter_proposals = None
+        self._proposals_by_window = {}
         
     def _prepare_dataframe(self) -> pd.DataFrame:
         """Convert raw JSON data to structured DataFrame"""
-        votes_list = []
-        
-        for proposal in self.data["proposals"]:
-            for vote in proposal["votes"]:
-                votes_list.append({
-                    "proposal_id": proposal["id"],
-                    "proposal_title": proposal["title"],
-                    "proposal_created": datetime.fromtimestamp(proposal["created"]),
-                    "voter": vote["voter"],
-                    "vote_time": datetime.fromtimestamp(vote["created"]),
-                    "voting_power": vote.get("vp", 0),
-                    "choice": vote["choice"]
-                })
-        
-        df = pd.DataFrame(votes_list)
-        df = df.sort_values("vote_time")
+        # Flatten proposals -> votes in one pass (max_level=0 stops
+        # weighted/ranked `choice` dicts from exploding into extra columns)
+        df = pd.json_normalize(
+            self.data["proposals"],
+            record_path="votes",
+            meta=["id", "created"],
+            meta_prefix="proposal_",
+            max_level=0
+        )
+
+        df = df.rename(columns={"created": "vote_time", "vp": "voting_power"})
+        if "voting_power" not in df:
+            df["voting_power"] = 0
+        df["voting_power"] = df["voting_power"].fillna(0)
+
+        return self._finalize_votes(df)
+
+    @classmethod
+    def _load_streaming(cls, path: Union[str, os.PathLike]) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        """
+        Build the vote DataFrame straight from a snapshot JSON file
+
+        Proposals are parsed one at a time with ijson, so peak memory is one
+        proposal plus the flat column lists, not the whole nested document.
+
+        Returns:
+            Vote DataFrame and a proposal id -> title lookup
+        """
+        import ijson
+        from collector import flatten_votes
+
+        proposal_titles = {}
+
+        def proposals(f):
+            for proposal in ijson.items(f, "proposals.item", use_float=True):
+                proposal_titles[proposal["id"]] = proposal["title"]
+                yield proposal
+
+        with open(path, 'rb') as f:
+            columns = flatten_votes(proposals(f))
+
+        df = pd.DataFrame({
+            "proposal_id": pd.Series(columns["proposal_id"], dtype=str),
+            "proposal_created": pd.Series(columns["proposal_created"], dtype="int64"),
+            "voter": pd.Series(columns["voter"], dtype=str),
+            "vote_time": pd.Series(columns["vote_time"], dtype="int64"),
+            "voting_power": pd.Series(columns["voting_power"], dtype="float64")
+        })
+        return cls._finalize_votes(df), proposal_titles
+
+    @staticmethod
+    def _finalize_votes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply the shared dtypes, column projection and sort to a raw vote frame
+
+        Only the columns the analysis reads are kept; vote ids, choices and
+        titles would otherwise add an object pointer per vote.
+
+        voting_power is stored as float32 (~7 significant digits), so values
+        in the millions of ARB are exact only to the nearest whole token.
+        """
+        # Epoch seconds -> datetime64, converted once so every later
+        # comparison/diff runs on int64 instead of boxed datetimes
+        # (json_normalize leaves meta columns as object dtype)
+        for col in ("proposal_created", "vote_time"):
+            df[col] = pd.to_datetime(df[col].astype("int64"), unit="s")
+
+        df = df[[
+            "proposal_id",
+            "proposal_created",
+            "voter",
+            "vote_time",
+            "voting_power"
+        ]]
+
+        # Addresses/ids repeat across many rows: store as integer codes
+        # (sorted categories, so every loader yields the same codes)
+        for col in ("voter", "proposal_id"):
+            df[col] = df[col].astype("category")
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+        df["voting_power"] = df["voting_power"].astype("float32")
+
+        # Stable sort on the raw int64 timestamps (radix-friendly, no
+        # datetime comparisons)
+        order = np.argsort(df["vote_time"].to_numpy().view(np.int64), kind="stable")
+        df = df.iloc[order].reset_index(drop=True)
         return df
+
+    @staticmethod
+    def _now() -> pd.Timestamp:
+        """Current time as naive UTC, matching the epoch-derived columns"""
+        return pd.Timestamp.now(tz="UTC").tz_localize(None)
     
     def calculate_participation_rate(self, voter: str, window_days: int = 30) -> float:
         """
@@ -48,22 +210,28 @@ class BehavioralAnalyzer:
         Returns:
             Participation rate (0.0 to 1.0)
         """
-        cutoff_date = datetime.now() - timedelta(days=window_days)
-        
-        # Filter relevant proposals and votes
-        recent_proposals = self.df_votes[
-            self.df_votes["proposal_created"] >= cutoff_date
-        ]["proposal_id"].nunique()
+        # Proposal sets are hashed once per analyzer (and per window), so
+        # repeated per-voter calls are set intersections, not frame scans
+        if self._voter_proposals is None:
+            self._voter_proposals = {
+                v: frozenset(group.to_numpy())
+                for v, group in self.df_votes.groupby("voter", sort=False, observed=True)["proposal_id"]
+            }
         
-        voter_votes = self.df_votes[
-            (self.df_votes["voter"] == voter) &
-            (self.df_votes["proposal_created"] >= cutoff_date)
-        ]["proposal_id"].nunique()
+        if window_days not in self._proposals_by_window:
+            cutoff_date = self._now() - pd.Timedelta(days=window_days)
+            self._proposals_by_window[window_days] = frozenset(
+                self.df_votes.loc[
+                    self.df_votes["proposal_created"] >= cutoff_date, "proposal_id"
+                ].unique()
+            )
         
-        if recent_proposals == 0:
+        recent_proposals = self._proposals_by_window[window_days]
+        if not recent_proposals:
             return 0.0
         
-        return voter_votes / recent_proposals
+        voter_votes = self._voter_proposals.get(voter, frozenset()) & recent_proposals
+        return len(voter_votes) / len(recent_proposals)
     
     def calculate_fatigue_index(self, voter: str) -> Dict:
         """
@@ -101,7 +269,7 @@ class BehavioralAnalyzer:
         burnout_detected = recent_gap > burnout_threshold
         
         # Participation trend (last 3 months vs previous 3 months)
-        midpoint = datetime.now() - timedelta(days=90)
+        midpoint = self._now() - pd.Timedelta(days=90)
         recent_votes = len(voter_data[voter_data["vote_time"] >= midpoint])
         older_votes = len(voter_data[voter_data["vote_time"] < midpoint])
         
@@ -126,6 +294,156 @@ class BehavioralAnalyzer:
             "total_votes": len(voter_data)
         }
     
+    def _gap_stats(self, midpoint: pd.Timestamp) -> pd.DataFrame:
+        """
+        Per-voter vote gap statistics, indexed by voter
+
+        Columns: avg_gap_days, longest_break_days, total_votes, recent_votes
+        (votes at/after `midpoint`) and recent_gap (last gap). Gap columns
+        are NaN for single-vote delegates. Uses the compiled kernel when
+        numba is installed, otherwise the equivalent pandas groupby.
+        """
+        if _fatigue_kernel is not None:
+            voters = self.df_votes["voter"]
+            codes = voters.cat.codes.to_numpy().astype(np.int32)
+            # df_votes is time-ordered, so a stable sort on voter alone gives
+            # (voter, vote_time) order
+            order = np.argsort(codes, kind="stable")
+            vote_time_ns = (
+                self.df_votes["vote_time"].to_numpy().astype("datetime64[ns]").view(np.int64)
+            )
+            group_codes, avg_gap, longest, total, recent, recent_gap = _fatigue_kernel(
+                codes[order], vote_time_ns[order], midpoint.as_unit("ns").value
+            )
+            index = pd.CategoricalIndex(
+                pd.Categorical.from_codes(group_codes, dtype=voters.dtype),
+                name="voter"
+            )
+            return pd.DataFrame({
+                "avg_gap_days": avg_gap,
+                "longest_break_days": longest,
+                "total_votes": total,
+                "recent_votes": recent,
+                "recent_gap": recent_gap
+            }, index=index)
+
+        # Time gaps between consecutive votes of each voter
+        votes = self.df_votes.sort_values(["voter", "vote_time"], kind="mergesort")
+        votes = votes.assign(
+            # float32 rather than int32: each voter's first row has no gap (NaN)
+            gap_days=votes.groupby("voter", sort=False, observed=True)["vote_time"].diff().dt.days.astype("float32"),
+            is_recent=votes["vote_time"] >= midpoint
+        )
+
+        stats = votes.groupby("voter", sort=False, observed=True).agg(
+            gap_sum=("gap_days", "sum"),
+            gap_count=("gap_days", "count"),
+            longest_break_days=("gap_days", "max"),
+            total_votes=("vote_time", "size"),
+            recent_votes=("is_recent", "sum")
+        )
+        # Whole-day sums are exact in float32; divide in float64 so the
+        # average rounds exactly like the compiled path
+        avg_gap_days = stats.pop("gap_sum").astype("float64") / stats.pop("gap_count")
+        stats.insert(0, "avg_gap_days", avg_gap_days)
+
+        # Most recent gap: rows are contiguous per voter, so each voter's
+        # last row is where the next row belongs to someone else
+        last_row = (votes["voter"] != votes["voter"].shift(-1)).to_numpy()
+        stats["recent_gap"] = pd.Series(
+            votes["gap_days"].to_numpy()[last_row],
+            index=votes["voter"].to_numpy()[last_row]
+        )
+
+        # Report in float64 like the compiled path (float32 only for storage)
+        stats[["longest_break_days", "recent_gap"]] = (
+            stats[["longest_break_days", "recent_gap"]].astype("float64")
+        )
+        return stats
+
+    def _delegate_metrics(self) -> Tuple[pd.Index, Dict[str, np.ndarray]]:
+        """
+        Compute every per-delegate metric as a plain array
+
+        Vectorized equivalent of calculate_participation_rate /
+        calculate_fatigue_index: one groupby pass instead of V mask scans.
+
+        Returns:
+            Voter index and a dict of metric arrays aligned with it
+        """
+        df = self.df_votes
+        now = self._now()
+
+        print(f"Analyzing {df['voter'].nunique()} delegates...")
+
+        # Participation rates (30/90 day windows), both from one pass:
+        # the 30d window is a subset of the 90d one, so each (voter,
+        # proposal) pair in the wider window is counted once and flagged
+        in_90d = df.loc[
+            df["proposal_created"] >= now - pd.Timedelta(days=90),
+            ["voter", "proposal_id", "proposal_created"]
+        ].drop_duplicates(["voter", "proposal_id"])
+        in_90d = in_90d.assign(
+            in_30d=in_90d["proposal_created"] >= now - pd.Timedelta(days=30)
+        )
+
+        window_proposals = in_90d.drop_duplicates("proposal_id")
+        total_proposals = {30: window_proposals["in_30d"].sum(), 90: len(window_proposals)}
+
+        voted = in_90d.groupby("voter", sort=False, observed=True).agg(
+            p30=("in_30d", "sum"),
+            p90=("in_30d", "size")
+        )
+        participation = {
+            window_days: (
+                voted[column] / total_proposals[window_days]
+                if total_proposals[window_days] else pd.Series(dtype=float)
+            )
+            for window_days, column in ((30, "p30"), (90, "p90"))
+        }
+
+        stats = self._gap_stats(now - pd.Timedelta(days=90))
+
+        enough_data = stats["total_votes"] >= 2
+
+        # Burnout detection: rapid voting followed by long silence
+        burnout_detected = ((stats["recent_gap"] > stats["avg_gap_days"] * 2) & enough_data).to_numpy()
+
+        # Participation trend (last 3 months vs previous 3 months)
+        older_votes = stats["total_votes"] - stats["recent_votes"]
+        trend = np.select(
+            [~enough_data, older_votes == 0, stats["recent_votes"] < older_votes],
+            ["insufficient_data", "new_delegate", "declining"],
+            default="stable"
+        )
+
+        longest_break = stats["longest_break_days"].where(enough_data, 0).astype(int).to_numpy()
+
+        # Fatigue score (0-100, higher = more fatigued), one ufunc pass
+        # over all delegates; insufficient_data rows score 0 by construction
+        fatigue_score = np.minimum(100, (
+            (longest_break / 30) * 30 +  # Long breaks
+            burnout_detected * 50 +  # Burnout pattern
+            (trend == "declining") * 20  # Declining trend
+        ))
+
+        return stats.index, {
+            "participation_30d": participation[30].reindex(stats.index, fill_value=0.0).round(3).to_numpy(),
+            "participation_90d": participation[90].reindex(stats.index, fill_value=0.0).round(3).to_numpy(),
+            "fatigue_score": fatigue_score.round(2),
+            "longest_break_days": longest_break,
+            "avg_gap_days": stats["avg_gap_days"].where(enough_data).round(1).to_numpy(),
+            "burnout_detected": burnout_detected,
+            "trend": trend,
+            "total_votes": stats["total_votes"].where(enough_data).to_numpy()
+        }
+
+    def _cached_metrics(self) -> Tuple[pd.Index, Dict[str, np.ndarray]]:
+        """_delegate_metrics(), computed once and shared by the results frame and summary"""
+        if self._metrics_cache is None:
+            self._metrics_cache = self._delegate_metrics()
+        return self._metrics_cache
+
     def analyze_all_delegates(self) -> pd.DataFrame:
         """
         Run analysis for all delegates in the dataset
@@ -133,27 +451,26 @@ class BehavioralAnalyzer:
         Returns:
             DataFrame with metrics for each delegate
         """
-        unique_voters = self.df_votes["voter"].unique()
-        results = []
-        
-        print(f"Analyzing {len(unique_voters)} delegates...")
-        
-        for voter in unique_voters:
-            participation_30d = self.calculate_participation_rate(voter, 30)
-            participation_90d = self.calculate_participation_rate(voter, 90)
-            fatigue = self.calculate_fatigue_index(voter)
-            
-            results.append({
-                "delegate": voter,
-                "participation_30d": round(participation_30d, 3),
-                "participation_90d": round(participation_90d, 3),
-                **fatigue
-            })
-        
-        df_results = pd.DataFrame(results)
+        if self._results_cache is not None:
+            return self._results_cache
+
+        voters, metrics = self._cached_metrics()
+        # Copy, so the cached metric dict keeps its plain trend array
+        metrics = {**metrics, "trend": pd.Categorical(metrics["trend"])}
+
+        df_results = pd.DataFrame(metrics, index=voters)
+        df_results = df_results.rename_axis("delegate").reset_index()
         df_results = df_results.sort_values("fatigue_score", ascending=False)
-        
+
+        self._results_cache = df_results
         return df_results
+
+    def invalidate_cache(self):
+        """Drop memoized results (call after modifying df_votes)"""
+        self._results_cache = None
+        self._metrics_cache = None
+        self._voter_proposals = None
+        self._proposals_by_window = {}
     
     def get_health_summary(self) -> Dict:
         """
@@ -162,7 +479,10 @@ class BehavioralAnalyzer:
         Returns:
             Summary statistics
         """
-        results = self.analyze_all_delegates()
+        if self._results_cache is None:
+            return self._compute_summary_fast()
+        
+        results = self._results_cache
         
         return {
             "total_delegates": len(results),
@@ -173,15 +493,28 @@ class BehavioralAnalyzer:
             "declining_delegates": len(results[results["trend"] == "declining"])
         }
 
+    def _compute_summary_fast(self) -> Dict:
+        """
+        Same summary as get_health_summary, reduced straight from the
+        metric arrays without building or sorting the per-delegate frame
+        """
+        voters, metrics = self._cached_metrics()
+        participation_30d = metrics["participation_30d"]
+        fatigue_score = metrics["fatigue_score"]
+        
+        return {
+            "total_delegates": len(voters),
+            "avg_participation_30d": round(participation_30d.mean(), 3),
+            "avg_fatigue_score": round(fatigue_score.mean(), 2),
+            "at_risk_delegates": int((fatigue_score > 60).sum()),
+            "active_delegates": int((participation_30d > 0.5).sum()),
+            "declining_delegates": int((metrics["trend"] == "declining").sum())
+        }
+
 
 if __name__ == "__main__":
     # Test with cached data
-    import json
-    
-    with open("data/cache/snapshot_data.json", 'r') as f:
-        data = json.load(f)
-    
-    analyzer = BehavioralAnalyzer(data)
+    analyzer = BehavioralAnalyzer("data/cache/snapshot_data.json")
     results = analyzer.analyze_all_delegates()
     print(results.head(10))
     print("\nDAO Health Summary:")
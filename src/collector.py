@@ -4,20 +4,221 @@ Fetches voting history from Snapshot GraphQL API
 """
 
 import requests
+import hashlib
 import json
-from typing import Dict, List, Optional
-from datetime import datetime
+import os
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime, timedelta
+
+try:
+    import requests_cache
+except ImportError:  # HTTP response caching is optional
+    requests_cache = None
+
+
+def flatten_votes(proposals: Iterable[Dict]) -> Dict[str, List]:
+    """
+    Flatten proposals -> votes into one list per vote table column
+
+    Shared by the Arrow table writer and BehavioralAnalyzer's streaming
+    JSON loader so both build the same rows. Pure Python (no pandas), and
+    `proposals` may be a lazy iterator.
+    """
+    columns = {
+        "proposal_id": [],
+        "proposal_created": [],
+        "voter": [],
+        "vote_time": [],
+        "voting_power": []
+    }
+    for proposal in proposals:
+        for vote in proposal["votes"]:
+            columns["proposal_id"].append(proposal["id"])
+            columns["proposal_created"].append(proposal["created"])
+            columns["voter"].append(vote["voter"])
+            columns["vote_time"].append(vote["created"])
+            columns["voting_power"].append(vote.get("vp") or 0)
+    return columns
+
+
+class _ETagStore:
+    """
+    SQLite table of ETag + response body per GraphQL query
+
+    Keyed on (query hash, variables hash) so a 304 Not Modified can be
+    answered with the body stored alongside its ETag. Shared by the
+    collector's worker threads. Rows older than `max_age` are pruned on
+    every write.
+    """
+
+    def __init__(self, path: str, max_age: timedelta):
+        self._max_age = max_age.total_seconds()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(etags)")]
+            if columns and "stored_at" not in columns:
+                # Layout without expiry; the rows are only a cache
+                self._conn.execute("DROP TABLE etags")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS etags ("
+                "query_hash TEXT, variables_hash TEXT, etag TEXT, body TEXT, "
+                "stored_at REAL, PRIMARY KEY (query_hash, variables_hash))"
+            )
+
+    @staticmethod
+    def key(query: str, variables: Dict) -> tuple:
+        return (
+            hashlib.sha256(query.encode()).hexdigest(),
+            hashlib.sha256(json.dumps(variables, sort_keys=True).encode()).hexdigest()
+        )
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        """Return (etag, body) for a query, or None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, body FROM etags WHERE query_hash = ? AND variables_hash = ?",
+                key
+            ).fetchone()
+
+    def put(self, key: tuple, etag: str, body: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO etags VALUES (?, ?, ?, ?, ?)",
+                (*key, etag, body, now)
+            )
+            self._conn.execute(
+                "DELETE FROM etags WHERE stored_at < ?", (now - self._max_age,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
 
 class SnapshotCollector:
     """Handles data extraction from Snapshot Hub API"""
     
     SNAPSHOT_API = "https://hub.snapshot.org/graphql"
+    MAX_WORKERS = 8
+    # Snapshot Hub allows ~100 requests/minute per IP
+    RATE_LIMIT_CALLS = 8
+    RATE_LIMIT_PERIOD = 5.0  # seconds
+    VOTES_PAGE_SIZE = 1000
+    MAX_SKIP = 5000
+    HTTP_CACHE_TTL = timedelta(hours=6)
     
-    def __init__(self, space_id: str = "arbitrumfoundation.eth"):
+    def __init__(self, space_id: str = "arbitrumfoundation.eth", use_http_cache: bool = True):
+        """
+        Args:
+            space_id: Snapshot space to collect from
+            use_http_cache: Serve repeated identical queries from an on-disk
+                SQLite cache for HTTP_CACHE_TTL (requires requests-cache), and
+                revalidate them with If-None-Match ETag requests
+        """
         self.space_id = space_id
         self.cache_dir = "data/cache"
+        self._etags = None
+        if use_http_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._etags = _ETagStore(f"{self.cache_dir}/etags.sqlite", self.HTTP_CACHE_TTL)
+        # Shared keep-alive connection pool for all worker threads
+        if use_http_cache and requests_cache is not None:
+            # POST bodies (query + variables) are part of the cache key
+            self.session = requests_cache.CachedSession(
+                f"{self.cache_dir}/http_cache.sqlite",
+                expire_after=self.HTTP_CACHE_TTL,
+                allowable_methods=["POST"],
+                match_headers=False,
+                filter_fn=self._is_graphql_success
+            )
+        else:
+            self.session = requests.Session()
+        self._rate_limiter = threading.Semaphore(self.RATE_LIMIT_CALLS)
+
+    @staticmethod
+    def _is_graphql_success(response: requests.Response) -> bool:
+        """HTTP cache filter: GraphQL errors arrive as 200s, keep them out"""
+        try:
+            return "errors" not in response.json()
+        except ValueError:
+            return False
+
+    def close(self):
+        """Release the HTTP session and the ETag store's SQLite connection"""
+        self.session.close()
+        if self._etags is not None:
+            self._etags.close()
+            self._etags = None
+
+    def _post(self, query: str, variables: Dict, headers: Optional[Dict] = None) -> requests.Response:
+        """
+        POST a GraphQL query, blocking while the rate limit is exhausted
+
+        Each request takes one slot from the semaphore; the slot is handed
+        back RATE_LIMIT_PERIOD seconds after the response arrives, so at most
+        RATE_LIMIT_CALLS requests hit the API within any period, regardless
+        of thread count. Responses served from the HTTP cache return their
+        slot immediately.
+        """
+        self._rate_limiter.acquire()
+        try:
+            response = self.session.post(
+                self.SNAPSHOT_API,
+                json={"query": query, "variables": variables},
+                headers=headers,
+                timeout=30
+            )
+        except Exception:
+            self._rate_limiter.release()
+            raise
+
+        if getattr(response, "from_cache", False):
+            self._rate_limiter.release()
+        else:
+            release = threading.Timer(self.RATE_LIMIT_PERIOD, self._rate_limiter.release)
+            release.daemon = True
+            release.start()
+
+        return response
+
+    def _query(self, query: str, variables: Dict) -> Dict:
+        """
+        Run a GraphQL query and return the decoded JSON body
+
+        When the ETag store is enabled, the last ETag seen for the same
+        (query, variables) is sent as If-None-Match; a 304 reply is answered
+        from the stored body without transferring it again.
+
+        Raises:
+            requests.RequestException: on transport or HTTP errors
+        """
+        key = stored = None
+        headers = {}
+        if self._etags is not None:
+            key = _ETagStore.key(query, variables)
+            stored = self._etags.get(key)
+            if stored:
+                headers["If-None-Match"] = stored[0]
+
+        response = self._post(query, variables, headers=headers)
+
+        if response.status_code == 304 and stored:
+            return json.loads(stored[1])
+
+        response.raise_for_status()
+        data = response.json()
+
+        etag = response.headers.get("ETag")
+        if key is not None and etag and "errors" not in data:
+            self._etags.put(key, etag, response.text)
+
+        return data
         
     def fetch_proposals(self, limit: int = 100) -> List[Dict]:
         """
@@ -55,13 +256,7 @@ class SnapshotCollector:
         }
         
         try:
-            response = requests.post(
-                self.SNAPSHOT_API,
-                json={"query": query, "variables": variables},
-                timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self._query(query, variables)
             
             if "errors" in data:
                 raise Exception(f"GraphQL Error: {data['errors']}")
@@ -76,6 +271,11 @@ class SnapshotCollector:
         """
         Fetch all votes for a specific proposal
         
+        Snapshot returns at most VOTES_PAGE_SIZE votes per request, so votes
+        are paged in creation order. Offsets are used up to MAX_SKIP (the
+        Hub rejects larger values); beyond that the query restarts from the
+        last seen `created` timestamp, de-duplicating the boundary votes.
+        
         Args:
             proposal_id: Snapshot proposal ID
             
@@ -83,10 +283,13 @@ class SnapshotCollector:
             List of vote dictionaries
         """
         query = """
-        query Votes($proposal: String!) {
+        query Votes($proposal: String!, $first: Int!, $skip: Int!, $created_gte: Int!) {
           votes(
-            first: 1000,
-            where: { proposal: $proposal }
+            first: $first,
+            skip: $skip,
+            where: { proposal: $proposal, created_gte: $created_gte },
+            orderBy: "created",
+            orderDirection: asc
           ) {
             id
             voter
@@ -97,18 +300,43 @@ class SnapshotCollector:
         }
         """
         
-        variables = {"proposal": proposal_id}
+        variables = {
+            "proposal": proposal_id,
+            "first": self.VOTES_PAGE_SIZE,
+            "skip": 0,
+            "created_gte": 0
+        }
+        votes = []
+        seen_ids = set()
         
         try:
-            response = requests.post(
-                self.SNAPSHOT_API,
-                json={"query": query, "variables": variables},
-                timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
+            while True:
+                data = self._query(query, variables)
+                
+                page = data["data"]["votes"]
+                new_votes = [v for v in page if v["id"] not in seen_ids]
+                votes.extend(new_votes)
+                seen_ids.update(v["id"] for v in new_votes)
+                
+                # Short page = last page
+                if len(page) < self.VOTES_PAGE_SIZE:
+                    break
+                # Full page of already seen votes: more than a page share one
+                # `created` second, so the cursor cannot advance past it
+                if not new_votes:
+                    print(
+                        f"Votes for {proposal_id} truncated at {len(votes)}: over "
+                        f"{self.VOTES_PAGE_SIZE} votes share created={variables['created_gte']}"
+                    )
+                    break
+                
+                if variables["skip"] + self.VOTES_PAGE_SIZE <= self.MAX_SKIP:
+                    variables["skip"] += self.VOTES_PAGE_SIZE
+                else:
+                    variables["skip"] = 0
+                    variables["created_gte"] = page[-1]["created"]
             
-            return data["data"]["votes"]
+            return votes
             
         except requests.RequestException as e:
             print(f"Failed to fetch votes for {proposal_id}: {e}")
@@ -133,11 +361,21 @@ class SnapshotCollector:
             "proposals": []
         }
         
-        for i, proposal in enumerate(proposals, 1):
-            print(f"Processing proposal {i}/{len(proposals)}: {proposal['title'][:50]}...")
-            
-            votes = self.fetch_votes(proposal["id"])
-            
+        # Fetch votes concurrently; results are re-ordered afterwards so the
+        # dataset keeps the API's proposal order
+        votes_by_id = {}
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(self.fetch_votes, proposal["id"]): proposal
+                for proposal in proposals
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                proposal = futures[future]
+                votes_by_id[proposal["id"]] = future.result()
+                print(f"Processed proposal {i}/{len(proposals)}: {proposal['title'][:50]}...")
+        
+        for proposal in proposals:
+            votes = votes_by_id[proposal["id"]]
             dataset["proposals"].append({
                 "id": proposal["id"],
                 "title": proposal["title"],
@@ -146,23 +384,61 @@ class SnapshotCollector:
                 "vote_count": len(votes),
                 "votes": votes
             })
-            
-            # Rate limiting
-            time.sleep(0.5)
         
         print(f"✓ Collected {len(dataset['proposals'])} proposals")
         return dataset
     
     def save_to_cache(self, data: Dict, filename: str = "snapshot_data.json"):
-        """Save collected data to local cache"""
-        import os
+        """
+        Save collected data to local cache
+        
+        Besides the raw JSON, writes a flat per-vote Arrow IPC (feather)
+        table that BehavioralAnalyzer reads directly, and a small metadata
+        sidecar (space, collection time, proposals without votes) for
+        reporting. The vote table is built with pyarrow, no pandas involved.
+        """
         os.makedirs(self.cache_dir, exist_ok=True)
         
         filepath = f"{self.cache_dir}/{filename}"
         with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+            json.dump(data, f)
         
         print(f"✓ Data cached to {filepath}")
+        
+        meta_path = f"{self.cache_dir}/snapshot_meta.json"
+        with open(meta_path, 'w') as f:
+            json.dump({
+                "space": data["space"],
+                "collected_at": data["collected_at"],
+                "proposals": [
+                    {k: v for k, v in proposal.items() if k != "votes"}
+                    for proposal in data["proposals"]
+                ]
+            }, f, indent=2)
+        
+        votes_path = f"{self.cache_dir}/votes.feather"
+        try:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+        except ImportError as e:
+            print(f"Skipping Arrow vote table ({e})")
+            # A table from an earlier run would shadow the fresh JSON
+            if os.path.exists(votes_path):
+                os.remove(votes_path)
+            return
+        
+        columns = flatten_votes(data["proposals"])
+        
+        # Dictionary-encoded ids load back into pandas as categoricals
+        table = pa.table({
+            "proposal_id": pa.array(columns["proposal_id"], pa.string()).dictionary_encode(),
+            "proposal_created": pa.array(columns["proposal_created"], pa.int64()),
+            "voter": pa.array(columns["voter"], pa.string()).dictionary_encode(),
+            "vote_time": pa.array(columns["vote_time"], pa.int64()),
+            "voting_power": pa.array(columns["voting_power"], pa.float64())
+        })
+        feather.write_feather(table, votes_path, compression="zstd")
+        print(f"✓ Vote table cached to {votes_path}")
     
     def load_from_cache(self, filename: str = "snapshot_data.json") -> Optional[Dict]:
         """Load data from cache if exists"""
@@ -179,4 +455,5 @@ if __name__ == "__main__":
     # Test collection
     collector = SnapshotCollector()
     data = collector.collect_full_dataset(num_proposals=10)
+    collector.close()
     collector.save_to_cache(data)
@@ -6,6 +6,7 @@ import argparse
 import json
 import sys
 from pathlib import Path
+from typing import Optional
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -14,12 +15,35 @@ from collector import SnapshotCollector
 from analysis import BehavioralAnalyzer
 
 
+def _fresh_vote_table(cache_dir: str) -> Optional[Path]:
+    """
+    Arrow vote table and sidecar, unless the raw JSON cache is newer
+
+    save_to_cache writes the JSON first, so a JSON newer than the table
+    (git pull, manual copy) means the table holds stale votes.
+    """
+    votes_cache = Path(cache_dir) / "votes.feather"
+    meta_cache = Path(cache_dir) / "snapshot_meta.json"
+    raw_cache = Path(cache_dir) / "snapshot_data.json"
+    
+    if not (votes_cache.exists() and meta_cache.exists()):
+        return None
+    if raw_cache.exists():
+        json_mtime = raw_cache.stat().st_mtime
+        if min(votes_cache.stat().st_mtime, meta_cache.stat().st_mtime) < json_mtime:
+            return None
+    return votes_cache
+
+
 def collect_command(args):
     """Handle data collection"""
     print(f"🔄 Collecting data from {args.space}...")
     
     collector = SnapshotCollector(space_id=args.space)
-    data = collector.collect_full_dataset(num_proposals=args.proposals)
+    try:
+        data = collector.collect_full_dataset(num_proposals=args.proposals)
+    finally:
+        collector.close()
     collector.save_to_cache(data)
     
     print(f"✅ Collection complete!")
@@ -29,16 +53,21 @@ def analyze_command(args):
     """Handle analysis"""
     print("📊 Running behavioral analysis...")
     
-    # Load data
-    collector = SnapshotCollector(space_id=args.space)
-    data = collector.load_from_cache()
+    # Load data (prebuilt Arrow vote table if available, else raw JSON)
+    collector = SnapshotCollector(space_id=args.space, use_http_cache=False)
+    votes_cache = _fresh_vote_table(collector.cache_dir)
     
-    if not data:
+    raw_cache = Path(collector.cache_dir) / "snapshot_data.json"
+    
+    if votes_cache:
+        analyzer = BehavioralAnalyzer(str(votes_cache))
+    elif raw_cache.exists():
+        analyzer = BehavioralAnalyzer(str(raw_cache))
+    else:
         print("❌ No cached data found. Run 'collect' command first.")
         return
     
     # Analyze
-    analyzer = BehavioralAnalyzer(data)
     results = analyzer.analyze_all_delegates()
     health = analyzer.get_health_summary()
     
@@ -71,14 +100,23 @@ def report_command(args):
     """Generate formatted report"""
     print("📝 Generating report...")
     
-    collector = SnapshotCollector(space_id=args.space)
-    data = collector.load_from_cache()
+    # Arrow vote table + metadata sidecar if available, else raw JSON
+    collector = SnapshotCollector(space_id=args.space, use_http_cache=False)
+    votes_cache = _fresh_vote_table(collector.cache_dir)
+    
+    if votes_cache:
+        data = collector.load_from_cache("snapshot_meta.json")
+    else:
+        data = collector.load_from_cache()
     
     if not data:
         print("❌ No cached data found. Run 'collect' command first.")
         return
     
-    analyzer = BehavioralAnalyzer(data)
+    if votes_cache:
+        analyzer = BehavioralAnalyzer(str(votes_cache))
+    else:
+        analyzer = BehavioralAnalyzer(data)
     results = analyzer.analyze_all_delegates()
     health = analyzer.get_health_summary()
     
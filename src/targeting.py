@@ -5,7 +5,6 @@ Służy do identyfikacji kluczowych celów pod Direct Outreach.
 """
 
 import pandas as pd
-import json
 import os
 from analysis import BehavioralAnalyzer
 
@@ -14,6 +13,15 @@ class WhaleSniper(BehavioralAnalyzer):
     Klasa potomna do identyfikacji 'zmęczonych wielorybów'.
     Łączy psychologię (Fatigue) z kapitałem (Voting Power).
     """
+
+    def __init__(self, data=None, votes_cache: str = BehavioralAnalyzer.VOTES_CACHE):
+        super().__init__(data, votes_cache)
+        # Cache wyników per próg min_vp
+        self._targets_cache = {}
+
+    def invalidate_cache(self):
+        super().invalidate_cache()
+        self._targets_cache = {}
     
     def get_high_value_targets(self, min_vp: int = 50000) -> pd.DataFrame:
         """
@@ -22,6 +30,9 @@ class WhaleSniper(BehavioralAnalyzer):
         Args:
             min_vp: Minimalna średnia siła głosu (domyślnie 50k ARB)
         """
+        if min_vp in self._targets_cache:
+            return self._targets_cache[min_vp]
+
         # 1. Wykorzystaj logikę z klasy bazowej do obliczenia zmęczenia
         print("--- Obliczanie wskaźników behawioralnych... ---")
         df_metrics = self.analyze_all_delegates()
@@ -32,24 +43,21 @@ class WhaleSniper(BehavioralAnalyzer):
         # 2. Agregacja Voting Power (VP) z surowych danych (to czego brakowało)
         print("--- Mapowanie kapitału (Voting Power)... ---")
         # Średnia siła głosu delegata ze wszystkich jego głosowań
-        vp_map = self.df_votes.groupby("voter")["voting_power"].mean()
-        
-        # 3. Merge (Złączenie metryk z kapitałem)
-        df_targets = df_metrics.merge(
-            vp_map.rename("avg_voting_power"), 
-            left_on="delegate", 
-            right_index=True
-        )
+        vp_map = self.df_votes.groupby("voter", sort=False, observed=True)["voting_power"].mean()
         
+        # 3. Mapowanie kapitału na delegatów (jeden wiersz na delegata,
+        #    więc wystarczy lookup po kluczu zamiast merge)
         # 4. Formatowanie liczb (czytelność)
-        df_targets["avg_voting_power"] = df_targets["avg_voting_power"].astype(int)
+        df_targets = df_metrics.assign(
+            avg_voting_power=df_metrics["delegate"].map(vp_map).astype("int64")
+        )
         
         # 5. Filtracja Snajperska (High Value + High Fatigue)
         # Celujemy w tych, którzy mają wpływ (>min_vp) ALE słabną (>50 fatigue)
-        targets = df_targets[
+        targets = df_targets.loc[
             (df_targets["avg_voting_power"] >= min_vp) & 
             (df_targets["fatigue_score"] > 50)
-        ].copy()
+        ]
         
         # 6. Sortowanie: Najpierw Kapitał, potem Zmęczenie
         targets = targets.sort_values(
@@ -57,6 +65,7 @@ class WhaleSniper(BehavioralAnalyzer):
             ascending=[False, False]
         )
         
+        self._targets_cache[min_vp] = targets
         return targets
 
     def export_hit_list(self, df: pd.DataFrame, filename: str = "data/celownik_wieloryby.csv"):
@@ -88,11 +97,9 @@ if __name__ == "__main__":
         exit(1)
         
     print(f"Wczytywanie danych z {CACHE_FILE}...")
-    with open(CACHE_FILE, 'r') as f:
-        raw_data = json.load(f)
     
-    # Inicjalizacja Snajpera
-    sniper = WhaleSniper(raw_data)
+    # Inicjalizacja Snajpera (strumieniowe parsowanie JSON)
+    sniper = WhaleSniper(CACHE_FILE)
     
     # Strzał: Szukamy delegatów z min. 100k ARB siły głosu
     df_whales = sniper.get_high_value_targets(min_vp=100000)
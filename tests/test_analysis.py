@@ -0,0 +1,91 @@
+"""
+Tests for the compiled fatigue kernel in the behavioral analysis module
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import analysis
+from analysis import BehavioralAnalyzer
+
+DAY = 86_400
+
+
+def _snapshot(votes_by_proposal):
+    """Minimal Snapshot dataset: {proposal_created_days_ago: [(voter, days_ago), ...]}"""
+    # Half a day off whole-day boundaries so the 30/90-day cutoffs cannot
+    # flip between the two runs
+    now = int(pd.Timestamp.now(tz="UTC").timestamp()) - DAY // 2
+    return {
+        "proposals": [
+            {
+                "id": f"0xprop{i}",
+                "title": f"Proposal {i}",
+                "created": now - created_ago * DAY,
+                "votes": [
+                    {
+                        "id": f"0xvote{i}-{j}",
+                        "voter": voter,
+                        "created": now - int(days_ago * DAY),
+                        "choice": 1,
+                        "vp": 1000.0 * (j + 1)
+                    }
+                    for j, (voter, days_ago) in enumerate(votes)
+                ]
+            }
+            for i, (created_ago, votes) in enumerate(votes_by_proposal.items())
+        ]
+    }
+
+
+@pytest.fixture
+def data():
+    return _snapshot({
+        400: [("0xsteady", 399)],
+        300: [("0xsteady", 298), ("0xsameday", 298)],
+        210: [("0xburnout", 209), ("0xsameday", 297.9)],
+        205: [("0xburnout", 204), ("0xsameday", 297.6)],
+        200: [("0xsteady", 199), ("0xburnout", 199)],
+        120: [("0xsteady", 118)],
+        60: [("0xsteady", 59)],
+        20: [("0xsteady", 19), ("0xsingle", 19)],
+        5: [("0xsteady", 4), ("0xburnout", 4)]
+    })
+
+
+def _results(data):
+    df = BehavioralAnalyzer(data).analyze_all_delegates()
+    df = df.assign(delegate=df["delegate"].astype(str))
+    return df.sort_values("delegate").reset_index(drop=True)
+
+
+def test_kernel_matches_pandas_fallback(data, monkeypatch):
+    pytest.importorskip("numba")
+    assert analysis._fatigue_kernel is not None
+
+    compiled = _results(data)
+    monkeypatch.setattr(analysis, "_fatigue_kernel", None)
+    fallback = _results(data)
+
+    pd.testing.assert_frame_equal(compiled, fallback)
+
+
+def test_edge_cases(data):
+    results = _results(data).set_index("delegate")
+
+    # Single vote: no gaps at all
+    assert pd.isna(results.loc["0xsingle", "avg_gap_days"])
+    assert results.loc["0xsingle", "trend"] == "insufficient_data"
+
+    # Several votes inside one day: every gap floors to 0
+    assert results.loc["0xsameday", "longest_break_days"] == 0
+    assert results.loc["0xsameday", "avg_gap_days"] == 0
+
+    # Long silence after a burst ends in burnout
+    assert results.loc["0xburnout", "longest_break_days"] == 195
+    assert bool(results.loc["0xburnout", "burnout_detected"])